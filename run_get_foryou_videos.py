@@ -2,5 +2,7 @@ from tiktok_crawler.crawler.foryoupage import CrawlerForYouPage
 
 crawl = CrawlerForYouPage(limit=5)
 tiktoks = crawl.get_tiktok_videos()
-for tiktok in tiktoks:
-    tiktok.save(path="./output")
+futures = [tiktok.save_async(path="./output") for tiktok in tiktoks]
+for future in futures:
+    if future is not None:
+        future.result()
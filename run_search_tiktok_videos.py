@@ -4,6 +4,8 @@ from tiktok_crawler.crawler.search import SearchCrawler
 
 crawl = SearchCrawler(limit=100, search="test")
 tiktoks = crawl.get_tiktok_videos()
-for tiktok in tiktoks:
-    tiktok.save(path="./output")
+futures = [tiktok.save_async(path="./output") for tiktok in tiktoks]
+for future in futures:
+    if future is not None:
+        future.result()
 
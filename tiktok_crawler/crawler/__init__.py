@@ -1,3 +1,4 @@
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.remote.webelement import WebElement
 
 from tiktok_crawler.entities import Author, Caption, Media, Metrics, Music, Tag, Tiktok
@@ -62,7 +63,12 @@ class Crawler(ABC):
                 element=element,
                 status="MediaNotFoundException"
             )
-                
+        
+        try:
+            tiktok.fetch_inner_html(self.driver)
+        except WebDriverException as e:
+            logging.warning(f"Unable to batch fetch innerHTML, falling back to fetching it per entity: {e}")
+            
         logging.info("DONE Extracting element")
         return tiktok
     
@@ -1,27 +1,127 @@
-from selenium.webdriver.remote.webelement import WebElement
+from __future__ import annotations
 
-from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from abc import ABC, abstractmethod, update_abstractmethods
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 import datetime
-import json
 import logging
+import orjson
 import os
-import requests
+import sys
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+    from selenium.webdriver.remote.webelement import WebElement
+
+_DOWNLOAD_POOL = ThreadPoolExecutor(max_workers=8)
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+def _get_session():
+    """Creates the `requests.Session` shared by the video downloads on first use, so importing the entities does not pull in `requests`. The lock ensures concurrent downloads never build more than one session."""
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            
+            _SESSION = requests.Session()
+            _SESSION.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=32))
+        return _SESSION
+
+def _strip(value:str) -> str:
+    """Strips surrounding whitespace from `value`, skipping the copy when it is already clean (the usual case for Selenium `.text`) or empty."""
+    if value and (value[0].isspace() or value[-1].isspace()):
+        return value.strip()
+    return value
+
+def _nested(expression:str, many:bool = False) -> tuple:
+    """Marks a `_to_dict` field whose value is an entity, or a list of entities when `many` is set, which `to_dict()` expands with its own `to_dict()`."""
+    if many:
+        return expression, f"[item.to_dict() for item in {expression}]"
+    return expression, f"{expression}.to_dict()"
+
+_COUNT_SUFFIXES = {"K": 1_000, "M": 1_000_000, "B": 1_000_000_000}
+
+def _parse_count(value:str | int | None) -> int | str | None:
+    """Parses a count displayed by Tiktok such as `246`, `1,024` or `76.2K` into an int. Ints and None are returned as is, empty text yields 0 and text which is not a count (e.g. a `Share` label) is kept as the stripped raw text so the scraped value is not lost."""
+    if value is None or isinstance(value, int):
+        return value
+    
+    text = value.strip().upper().replace(",", "")
+    try:
+        if text and text[-1] in _COUNT_SUFFIXES:
+            return round(float(text[:-1]) * _COUNT_SUFFIXES[text[-1]])
+        return int(text or 0)
+    except (ValueError, OverflowError):
+        logging.warning(f"Unable to parse count: {value!r}")
+        return value.strip()
+
+def _intern(value:str) -> str:
+    """Interns `value` so the authors, tags and music repeated across a crawl share a single string."""
+    return sys.intern(value) if value else value
+
+def _to_dict(**fields):
+    """Class decorator which generates the `to_dict()` method of an entity from `fields`, a mapping of each output key to the expression building its value. The method is compiled once per class into a single dict display.
+    
+    It also generates `_as_raw_dict()`, which leaves the `_nested` entities unexpanded so `_entity_default` can let orjson walk them directly.
+    """
+    def decorator(cls):
+        expressions = {
+            key: value if isinstance(value, tuple) else (value, value)
+            for key, value in fields.items()
+        }
+        raw_items = ", ".join(f"{key!r}: {raw}" for key, (raw, _) in expressions.items())
+        items = ", ".join(f"{key!r}: {expanded}" for key, (_, expanded) in expressions.items())
+        namespace = {}
+        exec(
+            f"def to_dict(self):\n    return {{{items}}}\n"
+            f"def _as_raw_dict(self):\n    return {{{raw_items}}}\n",
+            {}, namespace
+        )
+        for name in ("to_dict", "_as_raw_dict"):
+            method = namespace[name]
+            method.__qualname__ = f"{cls.__qualname__}.{name}"
+            setattr(cls, name, method)
+        update_abstractmethods(cls)
+        return cls
+    return decorator
+
+def _entity_default(obj):
+    """orjson `default` hook which serializes entities through their `_as_raw_dict()`, so the nested payload is written in one pass without building the full `to_dict()` tree first."""
+    if isinstance(obj, (TiktokEntity, Tiktok)):
+        return obj._as_raw_dict()
+    raise TypeError
 
 class TiktokEntity(ABC):
+    __slots__ = ()
+    
     @abstractmethod
     def __post_init__(self):
         ...
         
-    @abstractmethod
-    def __repr__(self):
-        ...
-        
     @abstractmethod
     def to_dict(self):
         ...
+    
+    @property
+    def inner_html(self) -> str:
+        """The innerHTML of `element`. It is fetched from the browser on first access and cached, unless `Tiktok.fetch_inner_html()` already fetched it."""
+        if self._inner_html is None and self.element is not None:
+            self._inner_html = self.element.get_attribute("innerHTML")
+        return self._inner_html
 
-@dataclass
+@_to_dict(
+    uniqueid="self.uniqueid",
+    nickname="self.nickname",
+    link="self.link",
+    avatar="self.avatar",
+    element="self.inner_html",
+)
+@dataclass(slots=True, unsafe_hash=True)
 class Author(TiktokEntity):
     """Model class representation of the user who posted the Tiktok video aka author.
 
@@ -30,36 +130,27 @@ class Author(TiktokEntity):
         avatar (str): Link to the avatar image of the author.
         link (str): Link to the profile of the author.
         nickname (str): Nickname of the author.
-        element (WebElement): The Selenium web element which contains the details of the author. 
+        element (WebElement): The Selenium web element which contains the details of the author.
     """
     uniqueid: str
-    avatar: str
-    link: str
-    nickname: str
-    element: WebElement
+    avatar: str = field(compare=False, repr=False)
+    link: str = field(repr=False)
+    nickname: str = field(compare=False)
+    element: WebElement = field(compare=False, repr=False)
+    _inner_html: str = field(init=False, repr=False, compare=False, default=None)
     
     def __post_init__(self):
-        self.uniqueid = self.uniqueid.strip()
-        self.avatar = self.avatar.strip()
-        self.link = self.link.strip()
-        self.nickname = self.nickname.strip()
-    
-    def __eq__(self, obj) -> bool:
-        return (self.uniqueid == obj.uniqueid) \
-            and (self.link == obj.link)
-            
-    def __repr__(self):
-        return f"Author(uniqueid={self.uniqueid}, nickname={self.nickname})"
-    
-    def to_dict(self):
-        return dict(
-            uniqueid=self.uniqueid,
-            nickname=self.nickname,
-            link=self.link,
-            avatar=self.avatar,
-        )
+        self.uniqueid = _intern(_strip(self.uniqueid))
+        self.avatar = _strip(self.avatar)
+        self.link = _intern(_strip(self.link))
+        self.nickname = _strip(self.nickname)
 
-@dataclass
+@_to_dict(
+    link="self.link",
+    text="self.text",
+    element="self.inner_html",
+)
+@dataclass(slots=True, unsafe_hash=True)
 class Tag(TiktokEntity):
     """Model class representation of a tag in Tiktok. A tag or hashtag is a text preceded by a hash sign (#) which is used to categorize posts.
 
@@ -71,26 +162,19 @@ class Tag(TiktokEntity):
     
     link: str
     text: str
-    element: WebElement
+    element: WebElement = field(compare=False, repr=False)
+    _inner_html: str = field(init=False, repr=False, compare=False, default=None)
     
     def __post_init__(self):
-        self.link = self.link.strip()
-        self.text = self.text.strip()
-    
-    def __eq__(self, obj) -> bool:
-        return (self.text == obj.text) \
-            and (self.link == obj.link)
-            
-    def __repr__(self):
-        return f"Tag(link={self.link}, text={self.text})"
-    
-    def to_dict(self):
-        return dict(
-            link=self.link,
-            text=self.text
-        )
-    
-@dataclass
+        self.link = _intern(_strip(self.link))
+        self.text = _intern(_strip(self.text))
+
+@_to_dict(
+    tags=_nested("self.tags", many=True),
+    text="self.text",
+    element="self.inner_html",
+)
+@dataclass(slots=True)
 class Caption(TiktokEntity):
     """Model class representation of the caption in a Tiktok video.
 
@@ -101,22 +185,18 @@ class Caption(TiktokEntity):
     """
     text: str
     tags: list[Tag]
-    element: WebElement
+    element: WebElement = field(compare=False, repr=False)
+    _inner_html: str = field(init=False, repr=False, compare=False, default=None)
 
     def __post_init__(self):
-        self.text = self.text.strip()
-    
-    def __repr__(self):
-        return f"Caption(text={self.text}, tags={self.tags})"
-    
-    def to_dict(self):
-        return dict(
-            tags=[tag.to_dict() for tag in self.tags],
-            text=self.text,
-            
-        )
+        self.text = _strip(self.text)
 
-@dataclass
+@_to_dict(
+    title="self.title",
+    link="self.link",
+    element="self.inner_html",
+)
+@dataclass(slots=True, unsafe_hash=True)
 class Music(TiktokEntity):
     """Model class representation of the music used in a Tiktok video.
 
@@ -127,27 +207,18 @@ class Music(TiktokEntity):
     """
     title: str
     link: str
-    element: WebElement
+    element: WebElement = field(compare=False, repr=False)
+    _inner_html: str = field(init=False, repr=False, compare=False, default=None)
     
     def __post_init__(self):
-        self.title = self.title.strip()
-        self.link = self.link.strip()
-    
-    def __eq__(self, obj) -> bool:
-        return (self.title == obj.title) \
-            and (self.link == obj.link)
-    
-    def __repr__(self):
-        return f"Music(title={self.title}, link={self.link})"
-    
-    def to_dict(self):
-        return dict(
-            title=self.title,
-            link=self.link,
-            
-        )
+        self.title = _intern(_strip(self.title))
+        self.link = _intern(_strip(self.link))
 
-@dataclass
+@_to_dict(
+    link="self.link",
+    element="self.inner_html",
+)
+@dataclass(slots=True)
 class Media(TiktokEntity):
     """Model class representation of the Tiktok video.
 
@@ -156,55 +227,52 @@ class Media(TiktokEntity):
         element (WebElement): The Selenium web element which contains the details of the video. 
     """
     link: str
-    element: WebElement
+    element: WebElement = field(compare=False, repr=False)
+    _inner_html: str = field(init=False, repr=False, compare=False, default=None)
     
     def __post_init__(self):
-        self.link = self.link.strip()
-    
-    def __repr__(self):
-        return f"Media(link={self.link})"
-    
-    def to_dict(self):
-        return dict(
-            link=self.link,
-            
-        )
-    
-@dataclass
+        self.link = _strip(self.link)
+
+@_to_dict(
+    likes="self.likes",
+    comments="self.comments",
+    shares="self.shares",
+    as_of=("self.as_of", "self.as_of.isoformat()"),
+    element="self.inner_html",
+)
+@dataclass(slots=True)
 class Metrics(TiktokEntity):
     """Model class representation of the metrics generated by the Tiktok video at a specific point of time.
 
     Args:
-        likes (str): The raw number of likes extracted.
-        comments (str): The raw number of comments extracted.
-        shares (str): The raw number of shares extracted.
+        likes (int | str): The raw number of likes extracted (e.g. `76.2K`). Parsed into an int on creation, or kept as the raw text if it is not a count.
+        comments (int | str): The raw number of comments extracted. Parsed into an int on creation, or kept as the raw text if it is not a count.
+        shares (int | str): The raw number of shares extracted. Parsed into an int on creation, or kept as the raw text if it is not a count.
         element (WebElement): The Selenium web element which contains the metrics.
-        as_of (str): The date time when the metrics are extracted in iso 8601 format. Defaults to the current date time.
+        as_of (datetime.datetime): The date time when the metrics are extracted. Defaults to the current date time, and is serialized in iso 8601 format when saved.
     """
-    likes: str
-    comments: str
-    shares: str
-    element: WebElement
-    as_of: str = datetime.datetime.now().isoformat()
+    likes: int | str
+    comments: int | str
+    shares: int | str
+    element: WebElement = field(compare=False, repr=False)
+    as_of: datetime.datetime = field(default_factory=datetime.datetime.now)
+    _inner_html: str = field(init=False, repr=False, compare=False, default=None)
     
     def __post_init__(self):
-        self.likes = self.likes.strip()
-        self.comments = self.comments.strip()
-        self.shares = self.shares.strip()
-    
-    def __repr__(self):
-        return f"Metrics(likes={self.likes}, comments={self.comments},shares={self.shares}, as_of={self.as_of} )"
-    
-    def to_dict(self):
-        return dict(
-            likes=self.likes,
-            comments=self.comments,
-            shares=self.shares,
-            as_of=self.as_of,
-            
-        )
+        self.likes = _parse_count(self.likes)
+        self.comments = _parse_count(self.comments)
+        self.shares = _parse_count(self.shares)
 
-@dataclass
+@_to_dict(
+    id="self.id",
+    Author=_nested("self.author"),
+    Caption=_nested("self.caption"),
+    Music=_nested("self.music"),
+    Media=_nested("self.media"),
+    Metrics=_nested("self.metrics"),
+    Status="self.status",
+)
+@dataclass(slots=True, unsafe_hash=True)
 class Tiktok:
     """Model class representation of the Tiktok video to be extracted. This class utilizes all the other `entities` dataclasses.
 
@@ -215,51 +283,97 @@ class Tiktok:
         music (Music): `entities.Music` instance of the Tiktok video.
         media (Media): `entities.Media` instance of the Tiktok video.
         metrics (Metrics): `entities.Metrics` instance of the Tiktok video.
-        element (WebElement): The Selenium web element which contains the Tiktok video.
+        element (WebElement): The Selenium web element which contains the Tiktok video. Released by the crawler once the innerHTML of the entities is fetched.
         status (str): A tag to signify if the scrape was sucessful. 
     """
     
     id: str
-    author: Author
-    caption: Caption
-    music: Music
-    media: Media
-    metrics: Metrics
-    element: WebElement
-    status: str = None
+    author: Author = field(compare=False)
+    caption: Caption = field(compare=False)
+    music: Music = field(compare=False)
+    media: Media = field(compare=False)
+    metrics: Metrics = field(compare=False)
+    element: WebElement = field(compare=False, repr=False)
+    status: str = field(default=None, compare=False)
     
     def save(self, path:str = "./"):
-        def _save_metadata(path):
-            file_path = os.path.join(path, f"{self.id}.json")
-            with open(file_path, 'w+') as file:
-                json.dump(self.to_dict(), file)
-                
-        def _save_video(path):
-            file_path = os.path.join(path, f"{self.id}.mp4")
-            response = requests.get(self.media.link)
-            with open(file_path, "wb") as file:
-                file.write(response.content)
-        
+        """Saves the metadata (json) and the video (mp4) of the Tiktok to `path`. The video is downloaded in the shared download pool while the metadata is written, and this method blocks until both are done.
+
+        Args:
+            path (str): Directory where the files are saved. Defaults to the current directory.
+        """
+        future = self.save_async(path)
+        if future is not None:
+            future.result()
+    
+    def save_async(self, path:str = "./") -> Future:
+        """Same as `save()` but returns as soon as the metadata is written, leaving the video download running in the shared download pool. Use this to save many Tiktoks concurrently.
+
+        Args:
+            path (str): Directory where the files are saved. Defaults to the current directory.
+
+        Returns:
+            Future: The pending video download, or None if the Tiktok has no media link.
+        """
         if self.media.link:
             logging.info("Saving Tiktok...")
-            _save_metadata(path)
-            _save_video(path)
-        else:
-            logging.error("Media is NULL")
+            future = _DOWNLOAD_POOL.submit(self._save_video, path)
+            self._save_metadata(path)
+            return future
+        
+        logging.error("Media is NULL")
+        return None
     
-    def to_dict(self):
-        return dict(
-            id=self.id,
-            Author=self.author.to_dict(),
-            Caption=self.caption.to_dict(),
-            Music=self.music.to_dict(),
-            Media=self.media.to_dict(),
-            Metrics=self.metrics.to_dict(),
-            Status=self.status
-        )
+    def to_json_bytes(self) -> bytes:
+        """Serializes the Tiktok to json, with the same content as `to_dict()`. Prefer this over `json.dumps(tiktok.to_dict())`, since orjson walks the entities directly without building the intermediate dict.
+
+        Returns:
+            bytes: The UTF-8 encoded json document.
+        """
+        return orjson.dumps(self, default=_entity_default, option=orjson.OPT_PASSTHROUGH_DATACLASS)
+    
+    def fetch_inner_html(self, driver:WebDriver):
+        """Fetches the innerHTML of every entity of the Tiktok in a single WebDriver round-trip and caches it on each entity. The web elements of the Tiktok and its entities are released afterwards.
 
-    def __eq__(self, obj) -> bool:
-        return self.id == obj.id
+        Args:
+            driver (WebDriver): The Selenium web driver which loaded the Tiktok video.
+            
+        Raises:
+            WebDriverException: if the batched script fails, e.g. on a stale element. The web elements are kept so `inner_html` can still fetch them one by one.
+        """
+        entities = [self.author, self.caption, self.music, self.media, self.metrics]
+        if self.caption is not None:
+            entities.extend(self.caption.tags)
+        entities = [entity for entity in entities if entity is not None and entity.element is not None]
+        pending = [entity for entity in entities if entity._inner_html is None]
+        if pending:
+            inner_htmls = driver.execute_script(
+                "return arguments[0].map(element => element.innerHTML);",
+                [entity.element for entity in pending]
+            )
+            for entity, inner_html in zip(pending, inner_htmls):
+                entity._inner_html = inner_html
+        
+        for entity in entities:
+            entity.element = None
+        self.element = None
     
-    def __repr__(self) -> str:
-        return f"Tiktok(id={self.id}, {self.status}, {self.author}, {self.caption}, {self.music}, {self.media}, {self.metrics})"
+    def _save_metadata(self, path:str):
+        file_path = os.path.join(path, f"{self.id}.json")
+        with open(file_path, 'wb') as file:
+            file.write(self.to_json_bytes())
+            
+    def _save_video(self, path:str):
+        file_path = os.path.join(path, f"{self.id}.mp4")
+        part_path = f"{file_path}.part"
+        try:
+            with _get_session().get(self.media.link, stream=True, timeout=(3, 30)) as response:
+                response.raise_for_status()
+                with open(part_path, "wb") as file:
+                    for chunk in response.iter_content(chunk_size=100 * 1024):
+                        file.write(chunk)
+        except Exception:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        os.replace(part_path, file_path)